@@ -7,7 +7,9 @@ Provides functionality to fetch and display images from Supabase storage
 import os
 import json
 import logging
+import functools
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
 from pathlib import Path
 
@@ -37,6 +39,12 @@ except ImportError:
     SUPABASE_AVAILABLE = False
 
 
+@functools.lru_cache(maxsize=4)
+def _get_supabase_client(supabase_url: str, supabase_key: str) -> "Client":
+    """Return a shared Supabase client per (url, key) so each manager reuses its HTTP connections"""
+    return create_client(supabase_url, supabase_key)
+
+
 class StudioSupabaseManager:
     """Manager class for Studio Supabase Storage operations"""
     
@@ -85,8 +93,8 @@ class StudioSupabaseManager:
             return result
             
         try:
-            # Create Supabase client
-            self.client = create_client(self.supabase_url, self.supabase_key)
+            # Reuse the Supabase client for these credentials
+            self.client = _get_supabase_client(self.supabase_url, self.supabase_key)
             
             # Test connection by making a simple database query
             # Try to access the generated_images table
@@ -96,11 +104,11 @@ class StudioSupabaseManager:
             self._authenticated = True
             result["success"] = True
             result["bucket_accessible"] = True
-            logger.info(f"✅ Supabase storage initialized successfully for bucket: {self.bucket_name}")
+            logger.info("✅ Supabase storage initialized successfully for bucket: %s", self.bucket_name)
                 
         except Exception as e:
             result["error"] = f"Initialization error: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
     
@@ -180,7 +188,7 @@ class StudioSupabaseManager:
                 result["total_count"] = len(images)
                 result["success"] = True
                 
-                logger.info(f"✅ Found {len(images)} images in generated_images table")
+                logger.info("✅ Found %s images in generated_images table", len(images))
             else:
                 result["images"] = []
                 result["total_count"] = 0
@@ -189,7 +197,7 @@ class StudioSupabaseManager:
             
         except Exception as e:
             result["error"] = f"Error listing images: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
     
@@ -258,7 +266,7 @@ class StudioSupabaseManager:
                 
         except Exception as e:
             result["error"] = f"Error getting metadata: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
     
@@ -299,7 +307,7 @@ class StudioSupabaseManager:
             
         except Exception as e:
             result["error"] = f"Error generating signed URL: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
     
@@ -351,13 +359,13 @@ class StudioSupabaseManager:
                 result["success"] = True
                 result["inserted_id"] = inserted_record.get('id')
                 result["record"] = inserted_record
-                logger.info(f"✅ Inserted image record with ID: {result['inserted_id']}")
+                logger.info("✅ Inserted image record with ID: %s", result['inserted_id'])
             else:
                 result["error"] = "No data returned from insert operation"
                 
         except Exception as e:
             result["error"] = f"Error inserting image: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
     
@@ -400,13 +408,13 @@ class StudioSupabaseManager:
                 result["success"] = True
                 result["file_path"] = filename
                 result["public_url"] = f"{self.supabase_url}/storage/v1/object/public/{self.bucket_name}/{filename}"
-                logger.info(f"✅ Uploaded image: {filename}")
+                logger.info("✅ Uploaded image: %s", filename)
             else:
                 result["error"] = "Upload failed - no response from storage"
                 
         except Exception as e:
             result["error"] = f"Error uploading image: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
     
@@ -473,19 +481,37 @@ class StudioSupabaseManager:
                 result["total_count"] = len(images)
                 result["success"] = True
                 
-                logger.info(f"✅ Found {len(images)} images matching query: '{query}'")
+                logger.info("✅ Found %s images matching query: '%s'", len(images), query)
             else:
                 result["images"] = []
                 result["total_count"] = 0
                 result["success"] = True
-                logger.info(f"ℹ️ No images found matching query: '{query}'")
+                logger.info("ℹ️ No images found matching query: '%s'", query)
                 
         except Exception as e:
             result["error"] = f"Error searching images: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
 
+    def _remove_storage_file(self, bucket: str, file_url: str, label: str, description: str) -> Optional[str]:
+        """Remove the file behind a public URL from a bucket, returning a deleted_files entry on success"""
+        if not file_url:
+            return None
+        try:
+            # Extract filename from URL
+            filename = file_url.split('/')[-1]
+            if filename and '.' in filename:
+                logger.info("🗑️ Attempting to delete %s '%s' from bucket '%s'", description, filename, bucket)
+                storage_response = self.client.storage.from_(bucket).remove([filename])
+                if storage_response:
+                    logger.info("✅ Deleted %s: %s", description, filename)
+                    return f"{label}: {filename}"
+                logger.warning("⚠️ Failed to delete %s: %s", description, filename)
+        except Exception as e:
+            logger.warning("⚠️ Error deleting %s: %s", description, e)
+        return None
+    
     def delete_image(self, image_id: int) -> Dict[str, Any]:
         """
         Delete an image and its associated 3D model from storage and database
@@ -523,42 +549,15 @@ class StudioSupabaseManager:
             image_url = record.get('image_url', '')
             model_3d_url = record.get('3d_url', '')
             
-            # Extract file paths from URLs
-            deleted_files = []
-            
-            # Delete image file from storage if URL exists
-            if image_url:
-                try:
-                    # Extract filename from URL
-                    image_filename = image_url.split('/')[-1]
-                    if image_filename and '.' in image_filename:
-                        # Delete from image bucket
-                        logger.info(f"🗑️ Attempting to delete image file '{image_filename}' from bucket '{self.image_bucket}'")
-                        storage_response = self.client.storage.from_(self.image_bucket).remove([image_filename])
-                        if storage_response:
-                            deleted_files.append(f"Image: {image_filename}")
-                            logger.info(f"✅ Deleted image file: {image_filename}")
-                        else:
-                            logger.warning(f"⚠️ Failed to delete image file: {image_filename}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Error deleting image file: {e}")
-            
-            # Delete 3D model file from storage if URL exists
-            if model_3d_url:
-                try:
-                    # Extract filename from URL
-                    model_filename = model_3d_url.split('/')[-1]
-                    if model_filename and '.' in model_filename:
-                        # Delete from 3D model bucket
-                        logger.info(f"🗑️ Attempting to delete 3D model file '{model_filename}' from bucket '{self.model_3d_bucket}'")
-                        storage_response = self.client.storage.from_(self.model_3d_bucket).remove([model_filename])
-                        if storage_response:
-                            deleted_files.append(f"3D Model: {model_filename}")
-                            logger.info(f"✅ Deleted 3D model file: {model_filename}")
-                        else:
-                            logger.warning(f"⚠️ Failed to delete 3D model file: {model_filename}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Error deleting 3D model file: {e}")
+            # Delete the image and 3D model files concurrently; they live in
+            # separate buckets so each removal is an independent round-trip
+            storage_targets = [
+                (self.image_bucket, image_url, "Image", "image file"),
+                (self.model_3d_bucket, model_3d_url, "3D Model", "3D model file"),
+            ]
+            with ThreadPoolExecutor(max_workers=len(storage_targets)) as executor:
+                removed = executor.map(lambda target: self._remove_storage_file(*target), storage_targets)
+                deleted_files = [entry for entry in removed if entry]
             
             # Delete the database record
             delete_response = self.client.table('generated_images').delete().eq('id', image_id).execute()
@@ -567,14 +566,14 @@ class StudioSupabaseManager:
                 result["success"] = True
                 result["deleted_record_id"] = image_id
                 result["deleted_files"] = deleted_files
-                logger.info(f"✅ Deleted image record with ID: {image_id}")
+                logger.info("✅ Deleted image record with ID: %s", image_id)
             else:
                 result["error"] = "Failed to delete database record"
-                logger.error(f"❌ Failed to delete database record for ID: {image_id}")
+                logger.error("❌ Failed to delete database record for ID: %s", image_id)
                 
         except Exception as e:
             result["error"] = f"Error deleting image: {e}"
-            logger.error(f"❌ {result['error']}")
+            logger.error("❌ %s", result['error'])
             
         return result
 
@@ -3,6 +3,7 @@
 Test database connection script
 """
 
+import argparse
 import psycopg2
 import os
 from dotenv import load_dotenv
@@ -137,6 +138,11 @@ def insert_test_data():
         print(f"❌ Error inserting test data: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test the PostgreSQL database connection")
+    parser.add_argument("--insert-test-data", action=argparse.BooleanOptionalAction, default=None,
+                       help="Insert a test row after a successful connection (prompts when omitted)")
+    args = parser.parse_args()
+    
     print("🧪 Database Connection Test")
     print("=" * 50)
     
@@ -144,9 +150,11 @@ if __name__ == "__main__":
         print("\n" + "=" * 50)
         print("🎉 Database connection test completed successfully!")
         
-        # Ask if user wants to insert test data
-        response = input("\nInsert test data? (y/n): ").lower().strip()
-        if response in ['y', 'yes']:
+        # Only ask if user wants to insert test data when no flag was given
+        insert = args.insert_test_data
+        if insert is None:
+            insert = input("\nInsert test data? (y/n): ").lower().strip() in ['y', 'yes']
+        if insert:
             insert_test_data()
     else:
         print("\n" + "=" * 50)
@@ -3,186 +3,258 @@
 Test script to verify GLB cleanup results
 """
 
+import os
+import sys
+import argparse
 import json
+import mmap
+import hashlib
+import struct
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
-from pygltflib import GLTF2
-
-def examine_glb(glb_path: str) -> dict:
-    """Examine GLB file structure and return key information."""
-    gltf = GLTF2().load(glb_path)
-    
-    info = {
-        "file_path": glb_path,
-        "file_size_mb": Path(glb_path).stat().st_size / (1024 * 1024),
-        "nodes": [],
-        "meshes": [],
-        "materials": [],
-        "textures": [],
-        "images": [],
-        "scenes": [],
-        "asset_info": {}
-    }
-    
-    # Examine nodes
-    if gltf.nodes:
-        for i, node in enumerate(gltf.nodes):
-            node_info = {
-                "index": i,
-                "name": getattr(node, 'name', None),
-                "mesh": getattr(node, 'mesh', None),
-                "children": getattr(node, 'children', [])
-            }
-            info["nodes"].append(node_info)
-    
-    # Examine meshes
-    if gltf.meshes:
-        for i, mesh in enumerate(gltf.meshes):
-            mesh_info = {
-                "index": i,
-                "name": getattr(mesh, 'name', None),
-                "primitives_count": len(mesh.primitives) if mesh.primitives else 0
-            }
-            info["meshes"].append(mesh_info)
-    
-    # Examine materials
-    if gltf.materials:
-        for i, material in enumerate(gltf.materials):
-            material_info = {
-                "index": i,
-                "name": getattr(material, 'name', None)
-            }
-            info["materials"].append(material_info)
-    
-    # Examine textures
-    if gltf.textures:
-        for i, texture in enumerate(gltf.textures):
-            texture_info = {
-                "index": i,
-                "name": getattr(texture, 'name', None),
-                "source": getattr(texture, 'source', None)
-            }
-            info["textures"].append(texture_info)
-    
-    # Examine images
-    if gltf.images:
-        for i, image in enumerate(gltf.images):
-            image_info = {
-                "index": i,
-                "name": getattr(image, 'name', None),
-                "uri": getattr(image, 'uri', None)
-            }
-            info["images"].append(image_info)
-    
-    # Examine scenes
-    if gltf.scenes:
-        for i, scene in enumerate(gltf.scenes):
-            scene_info = {
-                "index": i,
-                "name": getattr(scene, 'name', None),
-                "nodes": getattr(scene, 'nodes', [])
-            }
-            info["scenes"].append(scene_info)
-    
-    # Examine asset info
-    if hasattr(gltf, 'asset') and gltf.asset:
-        info["asset_info"] = {
-            "generator": getattr(gltf.asset, 'generator', None),
-            "version": getattr(gltf.asset, 'version', None),
-            "copyright": getattr(gltf.asset, 'copyright', None)
-        }
-    
-    return info
-
-def print_comparison(original_info: dict, cleaned_info: dict):
-    """Print a comparison between original and cleaned GLB files."""
-    print("=" * 80)
-    print("GLB CLEANUP COMPARISON")
-    print("=" * 80)
-    
-    print(f"\n📁 FILE INFO:")
-    print(f"Original: {original_info['file_path']} ({original_info['file_size_mb']:.2f} MB)")
-    print(f"Cleaned:  {cleaned_info['file_path']} ({cleaned_info['file_size_mb']:.2f} MB)")
-    
-    print(f"\n🏗️  STRUCTURE:")
-    print(f"Nodes:     {len(original_info['nodes'])} -> {len(cleaned_info['nodes'])}")
-    print(f"Meshes:    {len(original_info['meshes'])} -> {len(cleaned_info['meshes'])}")
-    print(f"Materials: {len(original_info['materials'])} -> {len(cleaned_info['materials'])}")
-    print(f"Textures:  {len(original_info['textures'])} -> {len(cleaned_info['textures'])}")
-    print(f"Images:    {len(original_info['images'])} -> {len(cleaned_info['images'])}")
-    print(f"Scenes:    {len(original_info['scenes'])} -> {len(cleaned_info['scenes'])}")
-    
-    print(f"\n🏷️  NODE NAMES:")
-    for i, (orig_node, clean_node) in enumerate(zip(original_info['nodes'], cleaned_info['nodes'])):
-        orig_name = orig_node['name'] or f"unnamed_{i}"
-        clean_name = clean_node['name'] or f"unnamed_{i}"
-        if orig_name != clean_name:
-            print(f"  Node {i}: '{orig_name}' -> '{clean_name}'")
-        else:
-            print(f"  Node {i}: '{orig_name}' (unchanged)")
-    
-    print(f"\n🔲 MESH NAMES:")
-    for i, (orig_mesh, clean_mesh) in enumerate(zip(original_info['meshes'], cleaned_info['meshes'])):
-        orig_name = orig_mesh['name'] or f"unnamed_{i}"
-        clean_name = clean_mesh['name'] or f"unnamed_{i}"
-        if orig_name != clean_name:
-            print(f"  Mesh {i}: '{orig_name}' -> '{clean_name}'")
-        else:
-            print(f"  Mesh {i}: '{orig_name}' (unchanged)")
-    
-    print(f"\n🎨 MATERIAL NAMES:")
-    for i, (orig_mat, clean_mat) in enumerate(zip(original_info['materials'], cleaned_info['materials'])):
-        orig_name = orig_mat['name'] or f"unnamed_{i}"
-        clean_name = clean_mat['name'] or f"unnamed_{i}"
-        if orig_name != clean_name:
-            print(f"  Material {i}: '{orig_name}' -> '{clean_name}'")
-        else:
-            print(f"  Material {i}: '{orig_name}' (unchanged)")
-    
-    print(f"\n🖼️  TEXTURE NAMES:")
-    for i, (orig_tex, clean_tex) in enumerate(zip(original_info['textures'], cleaned_info['textures'])):
-        orig_name = orig_tex['name'] or f"unnamed_{i}"
-        clean_name = clean_tex['name'] or f"unnamed_{i}"
-        if orig_name != clean_name:
-            print(f"  Texture {i}: '{orig_name}' -> '{clean_name}'")
-        else:
-            print(f"  Texture {i}: '{orig_name}' (unchanged)")
-    
-    print(f"\n📸 IMAGE NAMES:")
-    for i, (orig_img, clean_img) in enumerate(zip(original_info['images'], cleaned_info['images'])):
-        orig_name = orig_img['name'] or f"unnamed_{i}"
-        clean_name = clean_img['name'] or f"unnamed_{i}"
-        if orig_name != clean_name:
-            print(f"  Image {i}: '{orig_name}' -> '{clean_name}'")
-        else:
-            print(f"  Image {i}: '{orig_name}' (unchanged)")
-    
-    print(f"\n🎬 SCENE NAMES:")
-    for i, (orig_scene, clean_scene) in enumerate(zip(original_info['scenes'], cleaned_info['scenes'])):
-        orig_name = orig_scene['name'] or f"unnamed_{i}"
-        clean_name = clean_scene['name'] or f"unnamed_{i}"
+from typing import Dict, List, Literal, Optional
+
+GLB_MAGIC = b'glTF'
+GLB_JSON_CHUNK_TYPE = 0x4E4F534A  # 'JSON'
+
+def _read_glb_json(glb_path: str) -> dict:
+    """Read only the JSON chunk of a GLB, skipping the binary buffer chunk.
+    
+    The file is memory-mapped, so re-reads of a hot file are served from the
+    page cache and only the JSON chunk is copied into Python bytes.
+    """
+    with open(glb_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, _version, _length = struct.unpack_from('<4sII', mm, 0)
+        if magic != GLB_MAGIC:
+            # Plain .gltf files are JSON from the first byte
+            return json.loads(mm[:])
+        chunk_length, chunk_type = struct.unpack_from('<II', mm, 12)
+        if chunk_type != GLB_JSON_CHUNK_TYPE:
+            raise ValueError(f"First GLB chunk is not JSON: {glb_path}")
+        return json.loads(mm[20:20 + chunk_length])
+
+@functools.lru_cache(maxsize=8)
+def _load_glb_cached(glb_path: str, mtime_ns: int, size: int) -> dict:
+    """Parse a GLB once per (path, mtime, size) so unchanged files are not reloaded."""
+    return _read_glb_json(glb_path)
+
+@dataclass(frozen=True, slots=True)
+class NodeInfo:
+    index: int
+    name: Optional[str]
+    mesh: Optional[int]
+    children: List[int]
+
+@dataclass(frozen=True, slots=True)
+class MeshInfo:
+    index: int
+    name: Optional[str]
+    primitives_count: int
+
+@dataclass(frozen=True, slots=True)
+class MaterialInfo:
+    index: int
+    name: Optional[str]
+
+@dataclass(frozen=True, slots=True)
+class TextureInfo:
+    index: int
+    name: Optional[str]
+    source: Optional[int]
+
+@dataclass(frozen=True, slots=True)
+class ImageInfo:
+    index: int
+    name: Optional[str]
+    uri: Optional[str]
+
+@dataclass(frozen=True, slots=True)
+class SceneInfo:
+    index: int
+    name: Optional[str]
+    nodes: List[int]
+
+@dataclass(frozen=True, slots=True)
+class AssetInfo:
+    generator: Optional[str] = None
+    version: Optional[str] = None
+    copyright: Optional[str] = None
+
+@dataclass(slots=True)
+class GLBInfo:
+    """Key structure of one GLB file, as returned by examine_glb."""
+    file_path: str
+    file_size_mb: float
+    nodes: List[NodeInfo]
+    meshes: List[MeshInfo]
+    materials: List[MaterialInfo]
+    textures: List[TextureInfo]
+    images: List[ImageInfo]
+    scenes: List[SceneInfo]
+    asset_info: AssetInfo
+    counts: Dict[str, int] = field(default_factory=dict)
+    detail_level: str = "full"
+
+def _walk_nodes(gltf: dict) -> List[NodeInfo]:
+    return [
+        NodeInfo(i, node.get('name'), node.get('mesh'), node.get('children', []))
+        for i, node in enumerate(gltf.get('nodes', []))
+    ]
+
+def _walk_meshes(gltf: dict) -> List[MeshInfo]:
+    return [
+        MeshInfo(i, mesh.get('name'), len(mesh.get('primitives', [])))
+        for i, mesh in enumerate(gltf.get('meshes', []))
+    ]
+
+def _walk_materials(gltf: dict) -> List[MaterialInfo]:
+    return [
+        MaterialInfo(i, material.get('name'))
+        for i, material in enumerate(gltf.get('materials', []))
+    ]
+
+def _walk_textures(gltf: dict) -> List[TextureInfo]:
+    return [
+        TextureInfo(i, texture.get('name'), texture.get('source'))
+        for i, texture in enumerate(gltf.get('textures', []))
+    ]
+
+def _walk_images(gltf: dict) -> List[ImageInfo]:
+    return [
+        ImageInfo(i, image.get('name'), image.get('uri'))
+        for i, image in enumerate(gltf.get('images', []))
+    ]
+
+def _walk_scenes(gltf: dict) -> List[SceneInfo]:
+    return [
+        SceneInfo(i, scene.get('name'), scene.get('nodes', []))
+        for i, scene in enumerate(gltf.get('scenes', []))
+    ]
+
+def _walk_asset(gltf: dict) -> AssetInfo:
+    asset = gltf.get('asset') or {}
+    return AssetInfo(asset.get('generator'), asset.get('version'), asset.get('copyright'))
+
+# Per-category examiners, keyed by GLBInfo field
+GLB_WALKERS = {
+    "nodes": _walk_nodes,
+    "meshes": _walk_meshes,
+    "materials": _walk_materials,
+    "textures": _walk_textures,
+    "images": _walk_images,
+    "scenes": _walk_scenes,
+    "asset_info": _walk_asset,
+}
+
+# Entity lists counted in every GLBInfo, in report order
+ENTITY_KEYS = ["nodes", "meshes", "materials", "textures", "images", "scenes"]
+
+def examine_glb(glb_path: str, detail_level: Literal['summary', 'full'] = 'full') -> GLBInfo:
+    """Examine GLB file structure and return key information.
+    
+    With detail_level='summary' only the entity counts and asset info are
+    filled in; the per-entity records are left empty.
+    """
+    stat = os.stat(glb_path)
+    gltf = _load_glb_cached(glb_path, stat.st_mtime_ns, stat.st_size)
+    counts = {key: len(gltf.get(key, [])) for key in ENTITY_KEYS}
+    
+    if detail_level == 'summary':
+        sections = {key: [] for key in ENTITY_KEYS}
+        sections["asset_info"] = _walk_asset(gltf)
+    else:
+        sections = {key: walk(gltf) for key, walk in GLB_WALKERS.items()}
+    
+    return GLBInfo(file_path=glb_path, file_size_mb=stat.st_size / (1024 * 1024),
+                   counts=counts, detail_level=detail_level, **sections)
+
+def _fingerprint(info: GLBInfo) -> str:
+    """Hash everything in a GLBInfo except the file path and size."""
+    structure = asdict(info)
+    del structure["file_path"], structure["file_size_mb"]
+    canonical = json.dumps(structure, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+# (GLBInfo field, label, section heading) for each named GLB entity kind
+NAME_SECTIONS = [
+    ("nodes", "Node", "🏷️  NODE NAMES:"),
+    ("meshes", "Mesh", "🔲 MESH NAMES:"),
+    ("materials", "Material", "🎨 MATERIAL NAMES:"),
+    ("textures", "Texture", "🖼️  TEXTURE NAMES:"),
+    ("images", "Image", "📸 IMAGE NAMES:"),
+    ("scenes", "Scene", "🎬 SCENE NAMES:"),
+]
+
+def _append_name_diff(parts: list, label: str, heading: str, original_items: list, cleaned_items: list, show_unchanged: bool):
+    """Append the renamed entries of one entity kind to the report lines."""
+    parts.append(f"\n{heading}\n")
+    for i, (orig_item, clean_item) in enumerate(zip(original_items, cleaned_items)):
+        orig_name = orig_item.name or f"unnamed_{i}"
+        clean_name = clean_item.name or f"unnamed_{i}"
         if orig_name != clean_name:
-            print(f"  Scene {i}: '{orig_name}' -> '{clean_name}'")
-        else:
-            print(f"  Scene {i}: '{orig_name}' (unchanged)")
+            parts.append(f"  {label} {i}: '{orig_name}' -> '{clean_name}'\n")
+        elif show_unchanged:
+            parts.append(f"  {label} {i}: '{orig_name}' (unchanged)\n")
+
+def print_comparison(original_info: GLBInfo, cleaned_info: GLBInfo, show_unchanged: bool = False, stream=None):
+    """Print a comparison between original and cleaned GLB files.
+    
+    Unchanged names are only listed when show_unchanged is set. The report is
+    written to stream (default sys.stdout) in a single write.
+    """
+    parts = ["=" * 80 + "\n", "GLB CLEANUP COMPARISON\n", "=" * 80 + "\n"]
+    
+    parts.append("\n📁 FILE INFO:\n")
+    parts.append(f"Original: {original_info.file_path} ({original_info.file_size_mb:.2f} MB)\n")
+    parts.append(f"Cleaned:  {cleaned_info.file_path} ({cleaned_info.file_size_mb:.2f} MB)\n")
+    
+    full_detail = original_info.detail_level == cleaned_info.detail_level == 'full'
+    if full_detail and _fingerprint(original_info) == _fingerprint(cleaned_info):
+        parts.append("\n✅ GLBs are structurally identical\n")
+        parts.append("=" * 80 + "\n")
+        (stream or sys.stdout).write("".join(parts))
+        return
+    
+    parts.append("\n🏗️  STRUCTURE:\n")
+    parts.append(f"Nodes:     {original_info.counts['nodes']} -> {cleaned_info.counts['nodes']}\n")
+    parts.append(f"Meshes:    {original_info.counts['meshes']} -> {cleaned_info.counts['meshes']}\n")
+    parts.append(f"Materials: {original_info.counts['materials']} -> {cleaned_info.counts['materials']}\n")
+    parts.append(f"Textures:  {original_info.counts['textures']} -> {cleaned_info.counts['textures']}\n")
+    parts.append(f"Images:    {original_info.counts['images']} -> {cleaned_info.counts['images']}\n")
+    parts.append(f"Scenes:    {original_info.counts['scenes']} -> {cleaned_info.counts['scenes']}\n")
+    
+    # Name sections need the per-entity records from a full examination
+    if full_detail:
+        for key, label, heading in NAME_SECTIONS:
+            _append_name_diff(parts, label, heading, getattr(original_info, key), getattr(cleaned_info, key), show_unchanged)
     
-    print(f"\n📋 ASSET INFO:")
-    orig_gen = original_info['asset_info'].get('generator', 'None')
-    clean_gen = cleaned_info['asset_info'].get('generator', 'None')
+    parts.append("\n📋 ASSET INFO:\n")
+    orig_gen = original_info.asset_info.generator
+    clean_gen = cleaned_info.asset_info.generator
     if orig_gen != clean_gen:
-        print(f"  Generator: '{orig_gen}' -> '{clean_gen}'")
+        parts.append(f"  Generator: '{orig_gen}' -> '{clean_gen}'\n")
     else:
-        print(f"  Generator: '{orig_gen}' (unchanged)")
+        parts.append(f"  Generator: '{orig_gen}' (unchanged)\n")
     
-    orig_copyright = original_info['asset_info'].get('copyright', 'None')
-    clean_copyright = cleaned_info['asset_info'].get('copyright', 'None')
+    orig_copyright = original_info.asset_info.copyright
+    clean_copyright = cleaned_info.asset_info.copyright
     if orig_copyright != clean_copyright:
-        print(f"  Copyright: '{orig_copyright}' -> '{clean_copyright}'")
+        parts.append(f"  Copyright: '{orig_copyright}' -> '{clean_copyright}'\n")
     else:
-        print(f"  Copyright: '{orig_copyright}' (unchanged)")
+        parts.append(f"  Copyright: '{orig_copyright}' (unchanged)\n")
     
-    print("=" * 80)
+    parts.append("=" * 80 + "\n")
+    
+    (stream or sys.stdout).write("".join(parts))
 
 def main():
+    parser = argparse.ArgumentParser(description="Compare an original GLB with its cleaned copy")
+    parser.add_argument("--summary", action="store_true",
+                        help="only report entity counts and asset info, skipping the name diffs")
+    args = parser.parse_args()
+    
     original_path = "/Users/Interstellar/Downloads/shoes.glb"
     cleaned_path = "/Users/Interstellar/Downloads/shoes_cleaned.glb"
     
@@ -195,11 +267,13 @@ def main():
         print("Please run the cleanup script first: python glb_cleanup.py '/Users/Interstellar/Downloads/shoes.glb'")
         return
     
-    print("🔍 Examining original GLB file...")
-    original_info = examine_glb(original_path)
+    detail_level = 'summary' if args.summary else 'full'
     
-    print("🔍 Examining cleaned GLB file...")
-    cleaned_info = examine_glb(cleaned_path)
+    print("🔍 Examining original and cleaned GLB files...")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        original_future = executor.submit(examine_glb, original_path, detail_level)
+        cleaned_future = executor.submit(examine_glb, cleaned_path, detail_level)
+        original_info, cleaned_info = original_future.result(), cleaned_future.result()
     
     print_comparison(original_info, cleaned_info)
 
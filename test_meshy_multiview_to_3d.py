@@ -1,12 +1,19 @@
 import os
 import time
 import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.util.retry import Retry
 import sys
+import shutil
 from PIL import Image
 import io
 import base64
 from dotenv import load_dotenv
 import json
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,15 +30,59 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Parallel result downloads, matched to the session's connection pool size
+DOWNLOAD_WORKERS = 8
+
+# Block size for streaming model downloads to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Shared session so the polling loop and downloads reuse keep-alive connections.
+# HEADERS are passed per Meshy API call so the API key is not sent to the
+# image and model download hosts.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=DOWNLOAD_WORKERS,
+    pool_maxsize=DOWNLOAD_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504], raise_on_status=False),
+))
+
+# On-disk cache for downloaded source images, keyed by URL hash
+IMAGE_CACHE_DIR = Path("~/.cache/meshy_demo").expanduser()
+
+# Task status polling backoff, in seconds
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 15.0
+
 def download_image(url: str) -> Image.Image:
-    """Download image from URL and return PIL Image object"""
+    """Download image from URL and return PIL Image object
+    
+    Downloads are cached on disk by URL hash, so repeated demo runs reuse the
+    source image instead of fetching it again.
+    """
+    cache_path = IMAGE_CACHE_DIR / hashlib.sha256(url.encode()).hexdigest()
+    if cache_path.is_file():
+        print(f"Using cached image for: {url}")
+        return Image.open(cache_path)
+    
     print(f"Downloading image from: {url}")
-    response = requests.get(url, timeout=60)
+    response = SESSION.get(url, timeout=60)
     response.raise_for_status()
+    
+    IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    tmp_path.write_bytes(response.content)
+    os.replace(tmp_path, cache_path)
     return Image.open(io.BytesIO(response.content))
 
 def crop_multiview_image(image: Image.Image) -> dict:
     """Crop multiview image into 4 separate views"""
+    # Decode once up front and drop any alpha channel, so the four crops share
+    # one decoded RGB image and encode 3 bytes per pixel instead of 4
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    else:
+        image.load()
+    
     width, height = image.size
     half_width = width // 2
     half_height = height // 2
@@ -59,14 +110,14 @@ def crop_multiview_image(image: Image.Image) -> dict:
 def image_to_base64(image: Image.Image) -> str:
     """Convert PIL Image to base64 string"""
     buffer = io.BytesIO()
-    image.save(buffer, format='PNG')
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    return img_str
+    # The data is base64'd and sent once, so favour encode speed over size
+    image.save(buffer, format='PNG', compress_level=1)
+    # getbuffer() exposes the PNG bytes without the copy getvalue() makes
+    return base64.b64encode(buffer.getbuffer()).decode('ascii')
 
 def image_to_data_uri(image: Image.Image) -> str:
     """Convert PIL Image to data URI format for Meshy API"""
-    base64_str = image_to_base64(image)
-    return f"data:image/png;base64,{base64_str}"
+    return "data:image/png;base64," + image_to_base64(image)
 
 def create_meshy_multiview_task(views: dict, 
                                should_remesh=True,
@@ -86,18 +137,19 @@ def create_meshy_multiview_task(views: dict,
     """
     
     # Convert images to data URIs
-    image_urls = []
     view_names = ["front", "left", "back", "right"]  # Meshy expects this order
     
     for view_name in view_names:
-        if view_name in views:
-            image = views[view_name]
-            data_uri = image_to_data_uri(image)
-            image_urls.append(data_uri)
-            print(f"Converted {view_name} view to data URI")
-        else:
+        if view_name not in views:
             raise ValueError(f"Missing {view_name} view in views dictionary")
     
+    # PNG encoding releases the GIL, so the four views encode in parallel
+    with ThreadPoolExecutor(max_workers=len(view_names)) as executor:
+        image_urls = list(executor.map(image_to_data_uri, (views[view_name] for view_name in view_names)))
+    
+    for view_name in view_names:
+        print(f"Converted {view_name} view to data URI")
+    
     # Create payload according to Meshy API documentation
     payload = {
         "image_urls": image_urls,
@@ -114,7 +166,7 @@ def create_meshy_multiview_task(views: dict,
     print(f"Enable PBR: {enable_pbr}")
     
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{MESHY_BASE_URL}/multi-image-to-3d",
             headers=HEADERS,
             json=payload,
@@ -137,16 +189,34 @@ def create_meshy_multiview_task(views: dict,
         print(f"Error creating Meshy task: {e}")
         raise
 
+# Last (ETag, task JSON) seen per task, for conditional status polls
+_task_status_cache = {}
+
 def get_meshy_task_status(task_id: str):
-    """Get Meshy task status and results"""
+    """Get Meshy task status and results
+    
+    Sends If-None-Match when an earlier poll returned an ETag and reuses the
+    cached task JSON on 304 Not Modified.
+    """
+    headers = HEADERS
+    cached = _task_status_cache.get(task_id)
+    if cached:
+        headers = {**HEADERS, "If-None-Match": cached[0]}
+    
     try:
-        response = requests.get(
+        response = SESSION.get(
             f"{MESHY_BASE_URL}/multi-image-to-3d/{task_id}",
-            headers=HEADERS,
+            headers=headers,
             timeout=60
         )
+        if response.status_code == 304 and cached:
+            return cached[1]
         response.raise_for_status()
-        return response.json()
+        task_info = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            _task_status_cache[task_id] = (etag, task_info)
+        return task_info
     except requests.exceptions.RequestException as e:
         print(f"Error getting task status: {e}")
         if hasattr(e, 'response') and e.response is not None:
@@ -158,17 +228,22 @@ def download_meshy_model(url: str, output_path: str):
     """Download 3D model from Meshy URL"""
     print(f"Downloading model from: {url}")
     
+    started_writing = False
     try:
-        with requests.get(url, stream=True, timeout=300) as r:
+        with SESSION.get(url, stream=True, timeout=300) as r:
             r.raise_for_status()
+            # Copy the raw stream in 1 MiB blocks without a Python-level chunk loop
+            r.raw.decode_content = True
             with open(output_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+                started_writing = True
+                shutil.copyfileobj(r.raw, f, length=DOWNLOAD_CHUNK_SIZE)
         print(f"Model downloaded successfully: {output_path}")
         return output_path
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+        # Reading r.raw directly surfaces mid-stream failures as urllib3 errors
         print(f"Error downloading model: {e}")
+        if started_writing and os.path.exists(output_path):
+            os.remove(output_path)  # Don't leave a truncated model behind
         raise
 
 def save_cropped_views(views: dict, output_dir: str = "meshy_cropped_views"):
@@ -182,7 +257,7 @@ def save_cropped_views(views: dict, output_dir: str = "meshy_cropped_views"):
 def check_meshy_balance():
     """Check Meshy API balance"""
     try:
-        response = requests.get(
+        response = SESSION.get(
             f"{MESHY_BASE_URL}/balance",
             headers=HEADERS,
             timeout=60
@@ -243,13 +318,18 @@ def demo_meshy_multiview_to_3d():
         
         # Poll for completion
         print("\n⏳ Polling for completion... (this can take several minutes)")
+        poll_delay = POLL_INITIAL_DELAY
+        last_state = None
         while True:
             task_info = get_meshy_task_status(task_id)
             
             status = task_info["status"]
             progress = task_info.get("progress", 0)
             
-            print(f"Status: {status} | Progress: {progress}%")
+            # Only report polls that moved the task forward
+            if (status, progress) != last_state:
+                print(f"Status: {status} | Progress: {progress}%")
+                last_state = (status, progress)
             
             if status == "SUCCEEDED":
                 print("✅ Task completed successfully!")
@@ -259,32 +339,32 @@ def demo_meshy_multiview_to_3d():
                 print(f"❌ Task failed: {error_msg}")
                 sys.exit(1)
             
-            time.sleep(10)  # Poll every 10 seconds
+            # Poll quickly at first, then back off while the job is mid-way
+            time.sleep(poll_delay)
+            poll_delay = min(poll_delay * 1.5, POLL_MAX_DELAY)
         
         # Download the 3D model
         print("\n📦 Downloading 3D model...")
         model_urls = task_info["model_urls"]
         
+        # Collect every file to fetch as (url, output path, success message)
+        downloads = []
+        
         # Download GLB format (most common)
         if "glb" in model_urls:
-            glb_url = model_urls["glb"]
             glb_path = "meshy_multiview_model.glb"
-            download_meshy_model(glb_url, glb_path)
-            print(f"✅ GLB model downloaded: {glb_path}")
+            downloads.append((model_urls["glb"], glb_path, f"✅ GLB model downloaded: {glb_path}"))
         
         # Download other formats if available
         for format_name, url in model_urls.items():
-            if format_name != "glb":  # Already downloaded GLB
+            if format_name != "glb":  # Already queued GLB
                 format_path = f"meshy_multiview_model.{format_name}"
-                download_meshy_model(url, format_path)
-                print(f"✅ {format_name.upper()} model downloaded: {format_path}")
+                downloads.append((url, format_path, f"✅ {format_name.upper()} model downloaded: {format_path}"))
         
         # Download thumbnail if available
         if "thumbnail_url" in task_info:
-            thumbnail_url = task_info["thumbnail_url"]
             thumbnail_path = "meshy_multiview_thumbnail.png"
-            download_meshy_model(thumbnail_url, thumbnail_path)
-            print(f"✅ Thumbnail downloaded: {thumbnail_path}")
+            downloads.append((task_info["thumbnail_url"], thumbnail_path, f"✅ Thumbnail downloaded: {thumbnail_path}"))
         
         # Download textures if available
         if "texture_urls" in task_info and task_info["texture_urls"]:
@@ -294,8 +374,14 @@ def demo_meshy_multiview_to_3d():
             for i, texture_set in enumerate(task_info["texture_urls"]):
                 for texture_type, url in texture_set.items():
                     texture_path = f"{texture_dir}/texture_{i}_{texture_type}.png"
-                    download_meshy_model(url, texture_path)
-                    print(f"✅ {texture_type} texture downloaded: {texture_path}")
+                    downloads.append((url, texture_path, f"✅ {texture_type} texture downloaded: {texture_path}"))
+        
+        # The downloads are independent, so fetch them concurrently over the pooled session
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            futures = [(executor.submit(download_meshy_model, url, path), message) for url, path, message in downloads]
+            for future, message in futures:
+                future.result()
+                print(message)
         
         print("\n🎉 MESHY MULTI-IMAGE TO 3D DEMO COMPLETED SUCCESSFULLY!")
         print("=" * 70)
@@ -5,16 +5,31 @@ Test script for multi-view upload endpoint
 
 import requests
 import os
-from PIL import Image
 import io
+import struct
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """Frame one PNG chunk: length, type, data and CRC"""
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+def _build_solid_png(size, color) -> bytes:
+    """Encode a solid-colour 8-bit RGB PNG directly, without going through Pillow"""
+    width, height = size
+    # Every scanline is filter type 0 followed by the same run of pixels;
+    # the IDAT is stored uncompressed since the payload is thrown away after upload
+    scanline = b'\x00' + bytes(color) * width
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (PNG_SIGNATURE
+            + _png_chunk(b'IHDR', ihdr)
+            + _png_chunk(b'IDAT', zlib.compress(scanline * height, 0))
+            + _png_chunk(b'IEND', b''))
 
 def create_test_image(size=(512, 512), color=(128, 128, 128)):
     """Create a simple test image"""
-    img = Image.new('RGB', size, color)
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    return io.BytesIO(_build_solid_png(size, color))
 
 def test_multiview_upload():
     """Test the multi-view upload endpoint"""
@@ -18,7 +18,8 @@ def test_single_image_upload():
     # Create a simple test image
     test_image = Image.new('RGB', (512, 512), color='red')
     img_buffer = io.BytesIO()
-    test_image.save(img_buffer, format='PNG')
+    # Store-only PNG: the endpoint expects a PNG but the payload needs no compression
+    test_image.save(img_buffer, format='PNG', compress_level=0)
     img_buffer.seek(0)
     
     # Prepare the request
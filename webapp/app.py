@@ -11,6 +11,7 @@ import sys
 import uuid
 import pathlib
 import asyncio
+import importlib.util
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 import base64
@@ -22,9 +23,18 @@ import threading
 import logging
 import stripe
 import re
+import struct
+import tempfile
 import unicodedata
 
 
+try:
+    import pybase64
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    PYBASE64_AVAILABLE = False
+
+
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
@@ -40,6 +50,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Filename sanitization patterns, compiled once at import
+UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w\-_.]')
+REPEATED_UNDERSCORES_RE = re.compile(r'_+')
+
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename to be compatible with cloud storage services.
@@ -56,13 +70,13 @@ def sanitize_filename(filename: str) -> str:
     
     # Replace non-ASCII characters with their closest ASCII equivalent or remove them
     # This handles Chinese, Japanese, Korean, Arabic, etc.
-    filename = ''.join(c for c in filename if ord(c) < 128)
+    filename = filename.encode('ascii', 'ignore').decode('ascii')
     
     # Replace spaces and special characters with underscores
-    filename = re.sub(r'[^\w\-_.]', '_', filename)
+    filename = UNSAFE_FILENAME_CHARS_RE.sub('_', filename)
     
     # Remove multiple consecutive underscores
-    filename = re.sub(r'_+', '_', filename)
+    filename = REPEATED_UNDERSCORES_RE.sub('_', filename)
     
     # Remove leading/trailing underscores
     filename = filename.strip('_')
@@ -322,6 +336,40 @@ async def download_image_to_pil(image_url: str) -> Optional[Image.Image]:
         logger.error(f"Error loading image from {image_url}: {e}")
         return None
 
+# File extension to store each detected image MIME type under
+IMAGE_MIME_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+def detect_image_mime_type(image_data: bytes, default: str = "image/jpeg") -> str:
+    """Detect image MIME type from the file signature without decoding the image"""
+    header = image_data[:12]
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return "image/png"
+    if header.startswith(b'\xff\xd8\xff'):
+        return "image/jpeg"
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return "image/gif"
+    if len(header) == 12:
+        riff, _, webp = struct.unpack('<4sI4s', header)
+        if riff == b'RIFF' and webp == b'WEBP':
+            return "image/webp"
+    return default
+
+# Base64 encoder picked once at import: pybase64's direct-to-str variant when
+# the installed wheel has it, otherwise pybase64 or the stdlib plus a decode
+if PYBASE64_AVAILABLE and hasattr(pybase64, "b64encode_as_string"):
+    b64encode_to_str = pybase64.b64encode_as_string
+else:
+    _b64encode = pybase64.b64encode if PYBASE64_AVAILABLE else base64.b64encode
+
+    def b64encode_to_str(data: bytes) -> str:
+        """Base64-encode bytes directly to an ASCII string"""
+        return _b64encode(data).decode('ascii')
+
 def upload_image_to_supabase(image_data: bytes, filename: str, content_type: str = "image/png", bucket_name: str = None) -> Optional[str]:
     """Upload file to Supabase storage bucket using service key"""
     if not SUPABASE_AVAILABLE or not supabase_client:
@@ -654,6 +702,29 @@ def insert_image_record(target_object: str, image_url: str, iteration: int = Non
         logger.error(f"❌ Error inserting image record: {e}")
         return None
 
+# Shared HTTP session for image and file downloads, created on first use.
+# It serves every user's requests, so it pools connections but never keeps cookies.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """Return the shared requests session so downloads reuse pooled keep-alive connections"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+                from http.cookiejar import DefaultCookiePolicy
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                # Refuse every Set-Cookie so one user's response can't leak into another's request
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=100)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
 def download_image_to_pil_sync(image_url: str) -> Optional[Image.Image]:
     """Download image from URL or load from file and convert to PIL Image (synchronous version)"""
     try:
@@ -663,8 +734,7 @@ def download_image_to_pil_sync(image_url: str) -> Optional[Image.Image]:
             return Image.open(file_path)
         else:
             # Handle HTTP URL
-            import requests
-            response = requests.get(image_url, timeout=30)
+            response = get_http_session().get(image_url, timeout=30)
             if response.status_code == 200:
                 return Image.open(io.BytesIO(response.content))
             else:
@@ -674,49 +744,46 @@ def download_image_to_pil_sync(image_url: str) -> Optional[Image.Image]:
         logger.error(f"Error loading image from {image_url}: {e}")
         return None
 
-def generate_multiview_with_gpt_image1(target_object: str, iteration: int = 1, previous_feedback: List[str] = None, previous_image_url: str = None, user_feedback: str = None, image_size: str = DEFAULT_IMAGE_SIZE) -> str:
-    """Generate 2x2 multiview image using GPT-Image-1 with image-to-image capability"""
-    
-    # Create the generation instructions
-    instructions = f"""Your task is to generate a 2x2 grid with 4 specific views of the same object for 3D reconstruction: {target_object}. 
-
-GRID LAYOUT (2x2):
+# Static multiview prompt blocks, assembled once at import instead of on every call
+MULTIVIEW_GRID_LAYOUT = """GRID LAYOUT (2x2):
 - Top Left: FRONT view
 - Top Right: RIGHT view  
 - Bottom Left: LEFT view
-- Bottom Right: BACK view
-
-CRITICAL OBJECT CONSISTENCY REQUIREMENTS (MOST IMPORTANT):
-- EXACT same object type across ALL 4 views (e.g., if it's a Golden Retriever, ALL 4 views must show Golden Retrievers)
-- EXACT same color, texture, and material across ALL 4 views
-- EXACT same size and proportions across ALL 4 views
-- EXACT same pose/position of the object across ALL 4 views
-- NO variations in object appearance, shape, or characteristics
-- NO different objects in different grid positions
-- NO mixed object types (e.g., some Golden Retrievers, some other dog breeds)
+- Bottom Right: BACK view"""
 
-BACKGROUND AND LIGHTING REQUIREMENTS:
+MULTIVIEW_BACKGROUND_REQUIREMENTS = """BACKGROUND AND LIGHTING REQUIREMENTS:
 - PURE WHITE background (#FFFFFF) across ALL 4 views
 - NO shadows cast by the object on the background
 - NO background textures, patterns, or gradients
 - NO environmental lighting effects
 - Clean, studio-like lighting that evenly illuminates the object
-- Object should appear to float on pure white background
+- Object should appear to float on pure white background"""
 
-VIEW REQUIREMENTS:
+MULTIVIEW_VIEW_REQUIREMENTS = """VIEW REQUIREMENTS:
 - FRONT view: Object facing directly toward the camera
 - RIGHT view: Object rotated 90 degrees to show right side
 - LEFT view: Object rotated 90 degrees to show left side  
-- BACK view: Object rotated 180 degrees to show back/rear
+- BACK view: Object rotated 180 degrees to show back/rear"""
 
-OBJECT CONSISTENCY IS THE MOST CRITICAL FACTOR FOR 3D RECONSTRUCTION. FAILURE TO MAINTAIN CONSISTENCY WILL RESULT IN POOR RECONSTRUCTION QUALITY."""
+MULTIVIEW_BASE_REQUIREMENTS = "\n\n".join([
+    MULTIVIEW_GRID_LAYOUT,
+    """CRITICAL OBJECT CONSISTENCY REQUIREMENTS (MOST IMPORTANT):
+- EXACT same object type across ALL 4 views (e.g., if it's a Golden Retriever, ALL 4 views must show Golden Retrievers)
+- EXACT same color, texture, and material across ALL 4 views
+- EXACT same size and proportions across ALL 4 views
+- EXACT same pose/position of the object across ALL 4 views
+- NO variations in object appearance, shape, or characteristics
+- NO different objects in different grid positions
+- NO mixed object types (e.g., some Golden Retrievers, some other dog breeds)""",
+    MULTIVIEW_BACKGROUND_REQUIREMENTS,
+    MULTIVIEW_VIEW_REQUIREMENTS,
+    "OBJECT CONSISTENCY IS THE MOST CRITICAL FACTOR FOR 3D RECONSTRUCTION. FAILURE TO MAINTAIN CONSISTENCY WILL RESULT IN POOR RECONSTRUCTION QUALITY.",
+])
 
-    # Add feedback from previous iterations with user feedback having highest priority
-    ai_feedback_text = " ".join(previous_feedback) if previous_feedback else "No specific AI feedback available"
-    
-    if user_feedback:
-        # User feedback has highest priority
-        instructions += f"""
+# Prompt templates with only the per-call values left as str.format placeholders
+MULTIVIEW_GENERATION_TEMPLATE = "Your task is to generate a 2x2 grid with 4 specific views of the same object for 3D reconstruction: {target_object}. \n\n" + MULTIVIEW_BASE_REQUIREMENTS
+
+MULTIVIEW_USER_FEEDBACK_TEMPLATE = """
 
 HIGHEST PRIORITY - USER FEEDBACK (MUST ADDRESS):
 {user_feedback}
@@ -724,15 +791,70 @@ HIGHEST PRIORITY - USER FEEDBACK (MUST ADDRESS):
 This user feedback MUST be addressed and implemented in the next iteration. It takes precedence over all other considerations.
 
 ADDITIONAL AI SUGGESTIONS (if any):
-{ai_feedback_text if previous_feedback else "No additional AI suggestions"}
+{ai_suggestions}
 
 CRITICAL: The user's specific request above MUST be prioritized and implemented."""
+
+MULTIVIEW_AI_FEEDBACK_TEMPLATE = " IMPORTANT: Based on the previous image, address these specific issues: {ai_feedback_text}. Maintain the good aspects while fixing the problems identified."
+
+MULTIVIEW_FIRST_AI_FEEDBACK_TEMPLATE = " IMPORTANT: Address these specific issues from previous iteration: {ai_feedback_text}"
+
+MULTIVIEW_USER_EDIT_TEMPLATE = """Improve this 2x2 multiview image of {target_object} by addressing these specific issues:
+
+HIGHEST PRIORITY - USER FEEDBACK (MUST ADDRESS):
+{user_feedback}
+
+This user feedback MUST be addressed and implemented. It takes precedence over all other considerations.
+
+ADDITIONAL AI SUGGESTIONS (if any):
+{ai_suggestions}
+
+""" + MULTIVIEW_BACKGROUND_REQUIREMENTS + """
+
+CRITICAL: The user's specific request above MUST be prioritized and implemented. Maintain the overall structure and good aspects while addressing the user's feedback."""
+
+MULTIVIEW_AI_EDIT_TEMPLATE = """Improve this 2x2 multiview image of {target_object} by addressing these specific issues: {ai_feedback_text}. Maintain the overall structure and good aspects while fixing the identified problems.
+
+""" + MULTIVIEW_GRID_LAYOUT + """
+
+CRITICAL: Ensure EXACT object consistency across ALL 4 views:
+- Same object type, color, texture, size, and proportions
+- NO variations in object appearance or characteristics
+- NO mixed object types or different objects
+
+""" + MULTIVIEW_VIEW_REQUIREMENTS + """
+
+""" + MULTIVIEW_BACKGROUND_REQUIREMENTS + """
+
+OBJECT CONSISTENCY IS THE MOST CRITICAL FACTOR FOR 3D RECONSTRUCTION."""
+
+def generate_multiview_with_gpt_image1(target_object: str, iteration: int = 1, previous_feedback: List[str] = None, previous_image_url: str = None, user_feedback: str = None, image_size: str = DEFAULT_IMAGE_SIZE, output_dir: Optional[str] = None) -> str:
+    """Generate 2x2 multiview image using GPT-Image-1 with image-to-image capability
+    
+    Local files for this iteration are written to output_dir (normally the
+    session's temp directory), or to a fresh temp directory when not given.
+    """
+    if output_dir is None:
+        output_dir = tempfile.mkdtemp(prefix="mv_")
+    
+    # Create the generation instructions
+    instructions = MULTIVIEW_GENERATION_TEMPLATE.format(target_object=target_object)
+
+    # Add feedback from previous iterations with user feedback having highest priority
+    ai_feedback_text = " ".join(previous_feedback) if previous_feedback else "No specific AI feedback available"
+    
+    if user_feedback:
+        # User feedback has highest priority
+        instructions += MULTIVIEW_USER_FEEDBACK_TEMPLATE.format(
+            user_feedback=user_feedback,
+            ai_suggestions=ai_feedback_text if previous_feedback else "No additional AI suggestions",
+        )
     elif previous_feedback:
         # Only AI feedback available
         if iteration > 1:
-            instructions += f" IMPORTANT: Based on the previous image, address these specific issues: {ai_feedback_text}. Maintain the good aspects while fixing the problems identified."
+            instructions += MULTIVIEW_AI_FEEDBACK_TEMPLATE.format(ai_feedback_text=ai_feedback_text)
         else:
-            instructions += f" IMPORTANT: Address these specific issues from previous iteration: {ai_feedback_text}"
+            instructions += MULTIVIEW_FIRST_AI_FEEDBACK_TEMPLATE.format(ai_feedback_text=ai_feedback_text)
     
     try:
         # Debug logging
@@ -762,70 +884,30 @@ CRITICAL: The user's specific request above MUST be prioritized and implemented.
             else:
                 # Create edit instructions based on feedback with user feedback priority
                 if user_feedback:
-                    edit_instructions = f"""Improve this 2x2 multiview image of {target_object} by addressing these specific issues:
-
-HIGHEST PRIORITY - USER FEEDBACK (MUST ADDRESS):
-{user_feedback}
-
-This user feedback MUST be addressed and implemented. It takes precedence over all other considerations.
-
-ADDITIONAL AI SUGGESTIONS (if any):
-{ai_feedback_text if previous_feedback else "No additional AI suggestions"}
-
-BACKGROUND AND LIGHTING REQUIREMENTS:
-- PURE WHITE background (#FFFFFF) across ALL 4 views
-- NO shadows cast by the object on the background
-- NO background textures, patterns, or gradients
-- NO environmental lighting effects
-- Clean, studio-like lighting that evenly illuminates the object
-- Object should appear to float on pure white background
-
-CRITICAL: The user's specific request above MUST be prioritized and implemented. Maintain the overall structure and good aspects while addressing the user's feedback."""
+                    edit_instructions = MULTIVIEW_USER_EDIT_TEMPLATE.format(
+                        target_object=target_object,
+                        user_feedback=user_feedback,
+                        ai_suggestions=ai_feedback_text if previous_feedback else "No additional AI suggestions",
+                    )
                 else:
-                    edit_instructions = f"""Improve this 2x2 multiview image of {target_object} by addressing these specific issues: {ai_feedback_text}. Maintain the overall structure and good aspects while fixing the identified problems.
-
-GRID LAYOUT (2x2):
-- Top Left: FRONT view
-- Top Right: RIGHT view  
-- Bottom Left: LEFT view
-- Bottom Right: BACK view
-
-CRITICAL: Ensure EXACT object consistency across ALL 4 views:
-- Same object type, color, texture, size, and proportions
-- NO variations in object appearance or characteristics
-- NO mixed object types or different objects
-
-VIEW REQUIREMENTS:
-- FRONT view: Object facing directly toward the camera
-- RIGHT view: Object rotated 90 degrees to show right side
-- LEFT view: Object rotated 90 degrees to show left side  
-- BACK view: Object rotated 180 degrees to show back/rear
-
-BACKGROUND AND LIGHTING REQUIREMENTS:
-- PURE WHITE background (#FFFFFF) across ALL 4 views
-- NO shadows cast by the object on the background
-- NO background textures, patterns, or gradients
-- NO environmental lighting effects
-- Clean, studio-like lighting that evenly illuminates the object
-- Object should appear to float on pure white background
-
-OBJECT CONSISTENCY IS THE MOST CRITICAL FACTOR FOR 3D RECONSTRUCTION."""
+                    edit_instructions = MULTIVIEW_AI_EDIT_TEMPLATE.format(target_object=target_object, ai_feedback_text=ai_feedback_text)
                 
-                # Save PIL image to temporary file
-                import tempfile
-                temp_image_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                previous_image.save(temp_image_file, format='PNG')
-                temp_image_file.close()
+                if previous_image_url.startswith("file://") and previous_image.format == 'PNG':
+                    # The previous iteration's output is already a local PNG, send it as-is
+                    edit_image_path = previous_image_url.replace("file://", "")
+                else:
+                    # Save PIL image to the output directory
+                    edit_image_path = os.path.join(output_dir, f"iter_{iteration:02d}_source.png")
+                    previous_image.save(edit_image_path, format='PNG')
                 
                 # Create a proper mask with alpha channel for editing
                 # Create a white mask with transparency to allow full editing
                 mask_image = Image.new('RGBA', previous_image.size, (255, 255, 255, 255))
-                temp_mask_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                mask_image.save(temp_mask_file, format='PNG')
-                temp_mask_file.close()
+                mask_path = os.path.join(output_dir, f"iter_{iteration:02d}_mask.png")
+                mask_image.save(mask_path, format='PNG')
                 
                 # Open files in binary mode for the API
-                with open(temp_image_file.name, "rb") as image_file, open(temp_mask_file.name, "rb") as mask_file:
+                with open(edit_image_path, "rb") as image_file, open(mask_path, "rb") as mask_file:
                     response = openai_sync_client.images.edit(
                         model="gpt-image-1",
                         image=image_file,
@@ -855,13 +937,12 @@ OBJECT CONSISTENCY IS THE MOST CRITICAL FACTOR FOR 3D RECONSTRUCTION."""
                     sanitized_object_name = sanitize_filename(target_object)
                     filename = f"{sanitized_object_name}_{iteration}_{timestamp}.png"
                     
-                    # Create temporary file
-                    import tempfile
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                    temp_file.write(image_data)
-                    temp_file.close()
+                    # Write the image into the output directory
+                    output_path = os.path.join(output_dir, f"iter_{iteration:02d}.png")
+                    with open(output_path, "wb") as output_file:
+                        output_file.write(image_data)
                     
-                    return f"file://{temp_file.name}"
+                    return f"file://{output_path}"
                         
                 except Exception as e:
                     logger.error(f"❌ Error handling base64 data: {e}")
@@ -884,7 +965,6 @@ def run_hybrid_multiview_generation(session_id: str, target_object: str, mode: s
     previous_feedback = []
     previous_image_url = None
     all_results = []
-    iteration = 0
     
     # Set iteration limits based on mode
     if mode.lower() == "deep":
@@ -896,8 +976,13 @@ def run_hybrid_multiview_generation(session_id: str, target_object: str, mode: s
     
     logger.info(f"🚀 Starting {mode_display} for '{target_object}' (max {max_iterations} iterations)")
     
+    # One temp directory per session for generated images, edit sources and masks.
+    # It is not removed when the loop ends: the file:// URLs stay in use for
+    # serving the images and for the later 3D generation step.
+    session_temp_dir = tempfile.mkdtemp(prefix=f"mv_{session_id}_")
+    
     # Initialize session
-    active_sessions[session_id] = {
+    session = active_sessions[session_id] = {
         "status": "running",
         "target_object": target_object,
         "mode": mode,
@@ -905,32 +990,33 @@ def run_hybrid_multiview_generation(session_id: str, target_object: str, mode: s
         "max_iterations": max_iterations,
         "current_iteration": 0,
         "iterations": [],
+        # Set when the user submits feedback or stops the session
+        "feedback_event": threading.Event(),
     }
     
-    while True:
-        iteration += 1
-        
-        # Check iteration limit based on mode
-        if iteration > max_iterations:
-            active_sessions[session_id]["status"] = "completed"
-            active_sessions[session_id]["message"] = f"Reached maximum iterations ({max_iterations}) for {mode_display} - generation completed"
+    for iteration in range(1, max_iterations + 1):
+        # Stop before paying for another generation if the user cancelled
+        if session["status"] == "stopped":
+            logger.info(f"⏹️ Session {session_id} stopped by user after {iteration - 1} iterations")
             break
         
         # Update session status
-        active_sessions[session_id]["current_iteration"] = iteration
+        session["current_iteration"] = iteration
         
         # Get user feedback for this iteration
-        user_feedback_for_this_iteration = active_sessions[session_id].get("user_feedback_for_next", "")
+        user_feedback_for_this_iteration = session.get("user_feedback_for_next", "")
         
         if user_feedback_for_this_iteration:
             logger.info(f"🎯 Using user feedback for iteration {iteration}: {user_feedback_for_this_iteration}")
         
         # Generate image with GPT-Image-1 (image-to-image for iterations > 1)
-        image_url = generate_multiview_with_gpt_image1(target_object, iteration, previous_feedback, previous_image_url, user_feedback_for_this_iteration, image_size)
+        image_url = generate_multiview_with_gpt_image1(target_object, iteration, previous_feedback, previous_image_url, user_feedback_for_this_iteration, image_size, session_temp_dir)
         
         if not image_url:
-            active_sessions[session_id]["status"] = "failed"
-            active_sessions[session_id]["error"] = "Failed to generate image"
+            # Keep a stop that arrived during generation rather than reporting a failure
+            if session["status"] != "stopped":
+                session["status"] = "failed"
+                session["error"] = "Failed to generate image"
             break
         
         # Add the image to session
@@ -941,14 +1027,20 @@ def run_hybrid_multiview_generation(session_id: str, target_object: str, mode: s
         all_results.append(iteration_result)
         
         # Update session with iteration data
-        active_sessions[session_id]["iterations"].append(iteration_result)
+        session["iterations"].append(iteration_result)
         
         # Store current image URL for next iteration
         previous_image_url = image_url
         
+        # A stop can arrive while the image is generating; keep the finished
+        # image but honour the stop before the feedback pause resets the status
+        if session["status"] == "stopped":
+            logger.info(f"⏹️ Session {session_id} stopped by user during iteration {iteration}")
+            break
+        
         # Clear user feedback after it's been used
-        if "user_feedback_for_next" in active_sessions[session_id]:
-            del active_sessions[session_id]["user_feedback_for_next"]
+        if "user_feedback_for_next" in session:
+            del session["user_feedback_for_next"]
         
         # Print image URL info without cluttering the console
         if image_url.startswith('data:image/'):
@@ -961,29 +1053,30 @@ def run_hybrid_multiview_generation(session_id: str, target_object: str, mode: s
         # Pause for user feedback (except for the last iteration)
         if iteration < max_iterations:
             logger.info(f"⏸️ Pausing for user feedback after iteration {iteration}")
-            active_sessions[session_id]["status"] = "waiting_for_feedback"
-            active_sessions[session_id]["current_iteration"] = iteration
-            active_sessions[session_id]["feedback_prompt"] = f"Generation complete for iteration {iteration}. Any suggestions for improvement?"
-            
-            # Wait for user feedback (no timeout)
-            import time
+            feedback_event = session["feedback_event"]
+            feedback_event.clear()
+            session["status"] = "waiting_for_feedback"
+            session["current_iteration"] = iteration
+            session["feedback_prompt"] = f"Generation complete for iteration {iteration}. Any suggestions for improvement?"
             
-            while active_sessions[session_id]["status"] == "waiting_for_feedback":
-                time.sleep(1)
+            # Wait for user feedback (no timeout); submit_feedback and stop_generation
+            # set the event, the periodic wake-up is only a safety net
+            while session["status"] == "waiting_for_feedback":
+                feedback_event.wait(timeout=30)
             
             # Get user feedback if provided
-            user_feedback = active_sessions[session_id].get("user_feedback", "")
+            user_feedback = session.get("user_feedback", "")
             if user_feedback:
                 logger.info(f"💬 User feedback received: {user_feedback}")
                 # Store user feedback separately for high priority handling
-                active_sessions[session_id]["user_feedback_for_next"] = user_feedback
+                session["user_feedback_for_next"] = user_feedback
             else:
                 logger.info(f"⏭️ No user feedback provided, continuing with next iteration")
-                active_sessions[session_id]["user_feedback_for_next"] = ""
-        
-        # Add a minimal delay between iterations to prevent overwhelming the API
-        import time
-        time.sleep(0.5)
+                session["user_feedback_for_next"] = ""
+    else:
+        # Iteration limit based on mode reached
+        session["status"] = "completed"
+        session["message"] = f"Reached maximum iterations ({max_iterations}) for {mode_display} - generation completed"
     
     return {
         "session_id": session_id,
@@ -1108,6 +1201,7 @@ def stop_generation(session_id):
         # Mark session as stopped
         session["status"] = "stopped"
         session["error"] = "Generation stopped by user"
+        session["feedback_event"].set()
         
         logger.info(f"Stopped generation session {session_id}")
         
@@ -1154,6 +1248,7 @@ def submit_feedback(session_id):
         # Store user feedback in session
         session["user_feedback"] = user_feedback
         session["status"] = "running"  # Resume generation
+        session["feedback_event"].set()
         
         # Deduct credits after successful feedback submission
         success, new_balance = deduct_credits(user.id, 0.1, f"Feedback submission: {session.get('target_object', 'Unknown object')} (session {session_id})")
@@ -1209,10 +1304,9 @@ def get_iteration_image(session_id, iteration):
         
         # Handle OpenAI URLs - download and serve the image
         elif image_url.startswith('http'):
-            # Use requests to download the image
+            # Download the image over the shared session
             try:
-                import requests
-                response = requests.get(image_url, timeout=30)
+                response = get_http_session().get(image_url, timeout=30)
                 if response.status_code == 200:
                     # Determine content type from response headers or URL
                     content_type = response.headers.get('content-type', 'image/png')
@@ -1292,8 +1386,7 @@ def generate_3d():
                     image_data = f.read()
             else:
                 # Handle HTTP URL
-                import requests
-                response = requests.get(image_url, timeout=30)
+                response = get_http_session().get(image_url, timeout=30)
                 if response.status_code != 200:
                     return jsonify({"error": "Failed to download image"}), 400
                 image_data = response.content
@@ -1395,8 +1488,9 @@ def upload_multiview():
         front_file_data = front_file.read()
         front_file.seek(0)  # Reset file pointer
         
-        front_filename = f"front_view_{session_id}_{timestamp}.png"
-        front_supabase_url = upload_image_to_supabase(front_file_data, front_filename)
+        front_content_type = detect_image_mime_type(front_file_data, "image/png")
+        front_filename = f"front_view_{session_id}_{timestamp}{IMAGE_MIME_EXTENSIONS.get(front_content_type, '.png')}"
+        front_supabase_url = upload_image_to_supabase(front_file_data, front_filename, front_content_type)
         if not front_supabase_url:
             return jsonify({"error": "Failed to upload front view"}), 500
         
@@ -1828,8 +1922,9 @@ def upload_single_image():
         image_file.seek(0)  # Reset file pointer
         
         # Upload image to Supabase for database record
-        image_filename = f"single_image_{session_id}_{timestamp}.png"
-        image_supabase_url = upload_image_to_supabase(image_file_data, image_filename)
+        image_content_type = detect_image_mime_type(image_file_data, "image/png")
+        image_filename = f"single_image_{session_id}_{timestamp}{IMAGE_MIME_EXTENSIONS.get(image_content_type, '.png')}"
+        image_supabase_url = upload_image_to_supabase(image_file_data, image_filename, image_content_type)
         if not image_supabase_url:
             return jsonify({"error": "Failed to upload image"}), 500
         
@@ -2236,6 +2331,15 @@ def delete_supabase_studio_image(image_id):
         return jsonify({"error": str(e)}), 500
 
 
+# Content types served by the file proxy, keyed by lowercase file extension
+PROXY_CONTENT_TYPES = {
+    '.glb': 'model/gltf-binary',
+    '.gltf': 'model/gltf+json',
+    '.zip': 'application/zip',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+}
 
 @app.route('/api/studio/proxy-file')
 def proxy_file():
@@ -2250,22 +2354,12 @@ def proxy_file():
         # Import requests for making HTTP requests
         import requests
         
-        # Download the file
-        response = requests.get(url, timeout=30)
+        # Download the file over the shared session
+        response = get_http_session().get(url, timeout=30)
         response.raise_for_status()
         
         # Determine content type based on file extension
-        content_type = 'application/octet-stream'  # Default
-        if url.lower().endswith('.glb'):
-            content_type = 'model/gltf-binary'
-        elif url.lower().endswith('.gltf'):
-            content_type = 'model/gltf+json'
-        elif url.lower().endswith('.zip'):
-            content_type = 'application/zip'
-        elif url.lower().endswith(('.jpg', '.jpeg')):
-            content_type = 'image/jpeg'
-        elif url.lower().endswith('.png'):
-            content_type = 'image/png'
+        content_type = PROXY_CONTENT_TYPES.get(os.path.splitext(url.lower())[1], 'application/octet-stream')
         
         # Return the file content with appropriate headers
         return Response(
@@ -2758,15 +2852,18 @@ def stripe_webhook():
 # NANO BANANA AI IMAGE EDITING ROUTES
 # ============================================================================
 
-# Try to import Google Generative AI for Nano Banana
+# Check for Google Generative AI without importing it; the SDK is only
+# imported when a Nano Banana request actually needs it
 try:
-    import google.generativeai as genai
-    NANO_GEMINI_AVAILABLE = True
-    logger.info("✅ Google Generative AI imported for Nano Banana")
-except ImportError as e:
-    logger.warning(f"⚠️ Google Generative AI not available for Nano Banana: {e}")
+    NANO_GEMINI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
+except ImportError:
     NANO_GEMINI_AVAILABLE = False
 
+if NANO_GEMINI_AVAILABLE:
+    logger.info("✅ Google Generative AI available for Nano Banana")
+else:
+    logger.warning("⚠️ Google Generative AI not available for Nano Banana")
+
 def setup_nano_gemini():
     """Setup Gemini API configuration for Nano Banana."""
     if not NANO_GEMINI_AVAILABLE:
@@ -2777,6 +2874,7 @@ def setup_nano_gemini():
         return False, "GEMINI_API_KEY environment variable not found"
     
     try:
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         logger.info("✅ Nano Banana Gemini API configured successfully")
         return True, "Gemini API configured successfully"
@@ -2797,6 +2895,8 @@ def process_nano_image_with_gemini(main_image_bytes, reference_images_bytes=None
         tuple: (success, result_data, error_message)
     """
     try:
+        import google.generativeai as genai
+        
         # Create the model
         model = genai.GenerativeModel("gemini-2.5-flash-image-preview")
         
@@ -2804,7 +2904,7 @@ def process_nano_image_with_gemini(main_image_bytes, reference_images_bytes=None
         main_image_part = {
             "inline_data": {
                 "data": main_image_bytes,
-                "mime_type": "image/jpeg"
+                "mime_type": detect_image_mime_type(main_image_bytes)
             }
         }
         
@@ -2817,7 +2917,7 @@ def process_nano_image_with_gemini(main_image_bytes, reference_images_bytes=None
                 ref_image_part = {
                     "inline_data": {
                         "data": ref_image_bytes,
-                        "mime_type": "image/jpeg"
+                        "mime_type": detect_image_mime_type(ref_image_bytes)
                     }
                 }
                 contents.append(ref_image_part)
@@ -3008,7 +3108,7 @@ def nano_edit_image():
             # The credit deduction failure will be logged for manual review
         
         # Convert result to base64
-        result_base64 = base64.b64encode(result_data).decode('utf-8')
+        result_base64 = b64encode_to_str(result_data)
         
         # Generate unique filename
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")